@@ -1,36 +1,168 @@
 import pandas as pd
 import numpy as np
 import random
-from scipy.stats import chi2_contingency
+from scipy.stats import chi2_contingency, beta
 
 class DecisionTree:
-    def __init__(self, attribute=None, branches=None, label=None):
+    def __init__(self, attribute=None, branches=None, label=None, threshold=None, counts=None, classes=None,
+                 encoding=None):
         self.attribute = attribute                      # Attribute associated to the current node
-        self.branches = branches if branches else {}    # Branches for each attribute value
+        self.branches = branches if branches else {}    # Branches for each attribute value ('<=' and '>' for numeric attributes)
         self.label = label                              # Label for the leaf nodes
+        self.threshold = threshold                      # Split point for the numeric attributes
+        self.counts = counts                            # Number of training examples of each class reaching the node
+        self.classes = classes                          # Class label of each position in counts
+        self.encoding = encoding                        # Training attributes, vocabularies and numeric flags (root only)
+
+# Integer encoding of the attributes and of the WillWait labels, computed once before training
+class EncodedExamples:
+    def __init__(self, examples, attributes, target='WillWait', numeric=None, max_bins=None):
+        self.attributes = list(attributes)                                      # Attribute associated to each column of codes
+        if numeric is None:
+            numeric = [a for a in self.attributes if pd.api.types.is_numeric_dtype(examples[a])
+                       and not pd.api.types.is_bool_dtype(examples[a])]
+        self.numeric = np.array([a in numeric for a in self.attributes], dtype=bool)   # Attributes split with a threshold
+        self.binned = max_bins is not None                                      # Numeric attributes coded as quantile bins
+
+        self.codes = np.zeros((len(examples), len(self.attributes)), dtype=np.int32)
+        self.values = []                                                        # Sorted distinct values (bin upper bounds) of each attribute
+        self.numbers = {}                                                       # Values of the numeric attributes (not binned)
+        self.sorted_rows = {}                                                   # Rows sorted by value of the numeric attributes (not binned)
+        for j, attribute in enumerate(self.attributes):
+            if not self.numeric[j]:
+                codes, uniques = pd.factorize(examples[attribute], sort=True, use_na_sentinel=False)
+                self.codes[:, j] = codes
+                self.values.append(np.asarray(uniques))
+                continue
+
+            numbers = examples[attribute].to_numpy(dtype=float)
+            if np.isnan(numbers).any():
+                raise ValueError(f"Missing values in numeric attribute {attribute}")
+            if self.binned:
+                edges = quantile_edges(numbers, max_bins)
+                self.codes[:, j] = np.searchsorted(edges, numbers, side='left')
+                self.values.append(np.append(edges, np.inf))
+            else:
+                self.numbers[j] = numbers
+                self.sorted_rows[j] = np.argsort(numbers, kind='stable')
+                self.values.append(np.empty(0))
+        labels, classes = pd.factorize(examples[target], sort=True, use_na_sentinel=False)
+        self.labels = labels.astype(np.int32)                                   # Class index of each example
+        self.classes = np.asarray(classes)                                      # Class label of each class index
+
+        # Position of the first value of each attribute in the stacked contingency tables
+        self.offsets = np.concatenate(([0], np.cumsum([len(v) for v in self.values]))).astype(np.int64)
+
+        # Child position of each row, used to split the sorted rows of a node among its children
+        self.partition = np.zeros(len(examples), dtype=np.int32)
+
+# Bin edges of a numeric attribute (a value goes to the first bin whose upper edge is not below it)
+def quantile_edges(numbers, max_bins):
+    return np.unique(np.quantile(numbers, np.linspace(0, 1, max_bins + 1)[1:-1]))
 
 # Decision tree learning algorithm
-def learn_decision_tree(examples, attributes, default=None):
+def learn_decision_tree(examples, attributes, default=None, target='WillWait', numeric=None, max_bins=None):
     if examples.empty:
-        return DecisionTree(label=plurality_value(default))
-    elif len(set(examples['WillWait'])) == 1:
-        return DecisionTree(label=examples['WillWait'].iloc[0])
-    elif not attributes:
-        return DecisionTree(label=plurality_value(examples))
+        return DecisionTree(label=plurality_value(default, target))
+
+    data = EncodedExamples(examples, attributes, target, numeric, max_bins)
+    rows = np.arange(len(examples))
+    tree = learn_encoded_tree(data, rows, list(range(len(data.attributes))), sorted_rows=data.sorted_rows)
+    tree.encoding = training_encoding(data)
+    return tree
+
+# Attributes, value vocabularies and numeric flags of encoded examples, in the form expected by compile_tree
+def training_encoding(data):
+    vocabularies = [[] if data.numeric[j] else list(values) for j, values in enumerate(data.values)]
+    return list(data.attributes), vocabularies, [bool(flag) for flag in data.numeric]
+
+# Decision tree learning algorithm on the rows (index array) of the encoded examples
+def learn_encoded_tree(data, rows, columns, parent_counts=None, sorted_rows=None, max_features=None, rng=None):
+    if len(rows) == 0:
+        return DecisionTree(label=plurality_label(parent_counts, data.classes),
+                            counts=np.zeros(len(data.classes), dtype=np.int64), classes=data.classes)
+
+    counts = np.bincount(data.labels[rows], minlength=len(data.classes))
+    if np.count_nonzero(counts) == 1:
+        return DecisionTree(label=data.classes[data.labels[rows[0]]], counts=counts, classes=data.classes)
+    elif not columns:
+        return DecisionTree(label=plurality_label(counts, data.classes), counts=counts, classes=data.classes)
+
+    # Only a random subset of the attributes is considered at each node when max_features is set (random forests)
+    candidates = columns
+    if max_features is not None and len(columns) > max_features:
+        candidates = sorted(rng.choice(columns, max_features, replace=False).tolist())
+
+    # Information gain (and split position for the numeric attributes) of each candidate attribute
+    gains = np.full(len(candidates), -np.inf)
+    splits = np.zeros(len(candidates), dtype=np.int64)
+    tabled = [i for i, c in enumerate(candidates) if c not in data.numbers]
+    if tabled:
+        tabled_columns = [candidates[i] for i in tabled]
+        tables, offsets = contingency_tables(data, rows, tabled_columns)
+        gains[tabled], splits[tabled] = table_gains(tables, counts, offsets, tabled_columns, data.numeric)
+    for i, c in enumerate(candidates):
+        if c in data.numbers:
+            gains[i], splits[i] = sorted_gain(data.numbers[c][sorted_rows[c]], data.labels[sorted_rows[c]], counts)
+
+    # Numeric attributes with a single value in the examples cannot be split
+    if np.isneginf(gains).all():
+        return DecisionTree(label=plurality_label(counts, data.classes), counts=counts, classes=data.classes)
+
+    # Gains equal up to rounding are ties, broken by attribute order
+    position = int(np.flatnonzero(gains >= gains.max() - 1e-12)[0])
+    best = candidates[position]
+    tree = DecisionTree(attribute=data.attributes[best], counts=counts, classes=data.classes)
+
+    if data.numeric[best]:
+        # Binary split, the numeric attribute can be used again further down the tree
+        remaining_columns = columns
+        if best in data.numbers:
+            numbers = data.numbers[best][sorted_rows[best]]
+            tree.threshold = (numbers[splits[position]] + numbers[splits[position] + 1]) / 2
+            if tree.threshold == numbers[splits[position] + 1]:
+                tree.threshold = numbers[splits[position]]
+            right = data.numbers[best][rows] > tree.threshold
+        else:
+            tree.threshold = data.values[best][splits[position]]
+            right = data.codes[rows, best] > splits[position]
+        keys = ['<=', '>']
+        partitions = [rows[~right], rows[right]]
     else:
-        best_attr = choose_best_attribute(attributes, examples)
-        tree = DecisionTree(attribute=best_attr)
-        remaining_attributes = [a for a in attributes if a != best_attr]
-        
-        for value in np.unique(examples[best_attr]):
-            exs = examples[examples[best_attr] == value]
-            subtree = learn_decision_tree(exs, remaining_attributes, examples)
-            tree.branches[value] = subtree
-        return tree
+        # Partitioning the rows by value of the best attribute (values without examples get no branch)
+        remaining_columns = [c for c in columns if c != best]
+        table = tabled_columns.index(best)
+        value_counts = tables[offsets[table]:offsets[table + 1]].sum(axis=1)
+        order = np.argsort(data.codes[rows, best], kind='stable')
+        keys = data.values[best]
+        partitions = np.split(rows[order], np.cumsum(value_counts)[:-1])
+
+    # Splitting the sorted rows of the numeric attributes with stable boolean selections, keeping them sorted
+    child_sorted_rows = [{} for _ in partitions]
+    if sorted_rows:
+        for k, exs in enumerate(partitions):
+            data.partition[exs] = k
+        for c, ordered in sorted_rows.items():
+            positions = data.partition[ordered]
+            for k in range(len(partitions)):
+                child_sorted_rows[k][c] = ordered[positions == k]
+
+    for key, exs, child_sorted in zip(keys, partitions, child_sorted_rows):
+        if len(exs) == 0:
+            continue
+        subtree = learn_encoded_tree(data, exs, remaining_columns, counts, child_sorted, max_features, rng)
+        tree.branches[key] = subtree
+    return tree
+
+# Selecting the most common output value from the class counts
+def plurality_label(counts, classes):
+    # Break ties randomly
+    candidates = np.flatnonzero(counts == counts.max())
+    return classes[random.choice(list(candidates))]
 
 # Selecting the most common output value
-def plurality_value(examples):
-    class_counts = examples['WillWait'].value_counts()
+def plurality_value(examples, target='WillWait'):
+    class_counts = examples[target].value_counts()
     most_common_class = None
     max_count = 0
 
@@ -44,44 +176,72 @@ def plurality_value(examples):
     
     return most_common_class
 
-# Calculating entropy of the WillWait attribute
-def entropy(examples):
-    total_count = len(examples)
-    class_counts = examples['WillWait'].value_counts()
-    class_probabilities = class_counts / total_count
-    
-    entropy_value = 0
-    for prob in class_probabilities:
-        entropy_value -= prob * np.log2(prob)
-    
-    return entropy_value
-
-# Calculating information gain for attribute
-def information_gain(examples, attribute):
-    total_entropy = entropy(examples)
-    total_count = len(examples)
-
-    remainder = 0
-    for value in examples[attribute].unique():
-        subset = examples[examples[attribute] == value]
-        subset_entropy = entropy(subset)
-        remainder += (len(subset) / total_count) * subset_entropy
-    
-    info_gain = total_entropy - remainder
-    return info_gain
+# Position of the first value of each of the given attributes in their stacked contingency tables
+def table_offsets(offsets, columns):
+    columns = np.asarray(columns, dtype=np.int64)
+    return np.concatenate(([0], np.cumsum(offsets[columns + 1] - offsets[columns]))).astype(np.int64)
 
-# Choosing the attribute with the highest information gain
-def choose_best_attribute(attributes, examples):
-    best_attribute = None
-    max_gain = float('-inf')
-    
-    for attribute in attributes:
-        gain = information_gain(examples, attribute)
-        if gain > max_gain:
-            max_gain = gain
-            best_attribute = attribute
-    
-    return best_attribute
+# Counting the examples of each class for every value of the given attributes in a single pass,
+# the tables of the attributes are stacked in the order of columns
+def contingency_tables(data, rows, columns):
+    n_classes = len(data.classes)
+    offsets = table_offsets(data.offsets, columns)
+    combined = data.codes[np.ix_(rows, columns)] + offsets[:-1]
+    combined = combined * n_classes + data.labels[rows, None]
+    counts = np.bincount(combined.ravel(), minlength=offsets[-1] * n_classes)
+    return counts.reshape(-1, n_classes), offsets
+
+# Calculating entropy of the WillWait attribute for each row of class counts
+def entropy(counts):
+    counts = np.asarray(counts, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        probabilities = counts / counts.sum(axis=-1, keepdims=True)
+        terms = probabilities * np.log2(probabilities)
+    # Classes without examples (0 * log 0) contribute nothing
+    return -np.where(counts > 0, terms, 0).sum(axis=-1)
+
+# Calculating information gain for each attribute (column) from its contingency table (offsets of table_offsets),
+# numeric (binned) attributes get the gain of their best threshold and the bin it follows
+def table_gains(tables, counts, offsets, columns, numeric):
+    total_entropy = entropy(counts)
+    total_count = counts.sum()
+
+    weighted = tables.sum(axis=1) * entropy(tables)
+    remainders = np.add.reduceat(weighted, offsets[:-1]) / total_count
+    gains = total_entropy - remainders
+    splits = np.zeros(len(columns), dtype=np.int64)
+    for i, c in enumerate(columns):
+        if numeric[c]:
+            gains[i], splits[i] = threshold_gain(tables[offsets[i]:offsets[i + 1]], counts)
+    return gains, splits
+
+# Calculating the best information gain of a binary split after one of the given rows of ordered class counts
+def threshold_gain(ordered_counts, counts):
+    left = np.cumsum(ordered_counts, axis=0)[:-1]
+    return split_gain(left, counts, np.arange(len(left)))
+
+# Calculating the best information gain among candidate splits from the class counts left of each of them
+def split_gain(left, counts, candidates):
+    total_count = counts.sum()
+    left_count = left.sum(axis=1)
+    valid = (left_count > 0) & (left_count < total_count)
+    if not valid.any():
+        return -np.inf, 0
+    left, left_count, candidates = left[valid], left_count[valid], candidates[valid]
+
+    remainders = (left_count * entropy(left) + (total_count - left_count) * entropy(counts - left)) / total_count
+    gains = entropy(counts) - remainders
+    split = int(np.argmax(gains))
+    return gains[split], candidates[split]
+
+# Calculating the best information gain of a threshold on sorted values of a numeric attribute,
+# with the class counts accumulated one class at a time and kept only between distinct values
+def sorted_gain(numbers, labels, counts):
+    candidates = np.flatnonzero(numbers[:-1] < numbers[1:])
+    left = np.empty((len(candidates), len(counts)), dtype=np.int64)
+    for k in range(len(counts)):
+        left[:, k] = np.cumsum(labels == k)[candidates]
+    return split_gain(left, counts, candidates)
 
 # Printing the decision tree
 def print_tree(node, indent=""):
@@ -90,39 +250,290 @@ def print_tree(node, indent=""):
     else:
         print(indent + "Attribute:", node.attribute)
         for value, subtree in node.branches.items():
-            print(indent + f"{node.attribute} = {value}")
+            if node.threshold is not None:
+                print(indent + f"{node.attribute} {value} {node.threshold}")
+            else:
+                print(indent + f"{node.attribute} = {value}")
             print_tree(subtree, indent + "    ")
 
-# Determining whether to prune a node using chi-square test
-def chi_square_test(node, examples, alpha=0.05):
-    observed = []
-    class_labels = examples['WillWait'].unique()
-    
-    for value, _ in node.branches.items():
-        subset = examples[examples[node.attribute] == value]
-        if len(subset) == 0: # Skipping branches with no examples
+# Flat array representation of a decision tree for batch prediction
+class CompiledTree:
+    def __init__(self, attributes, vocabularies, numeric, classes, feature, threshold, child_start, children, label):
+        self.attributes = list(attributes)      # Attribute associated to each feature index
+        self.vocabularies = vocabularies        # Known values of each attribute (position in the list = value code)
+        self.numeric = np.asarray(numeric)      # Features compared with a threshold instead of coded
+        self.classes = np.asarray(classes)      # Class label of each class index
+        self.feature = feature                  # Feature index tested by each node (-1 for the leaf nodes)
+        self.threshold = threshold              # Split point of each numeric node (NaN for the other nodes)
+        self.child_start = child_start          # Position of the children of each node in the children array
+        self.children = children                # Child node for each (node, value code) pair (-1 if there is no branch)
+        self.label = label                      # Class index of each leaf, plurality class index for the other nodes
+
+    # Converting the attribute values of a DataFrame or of a 2D array (columns ordered as attributes)
+    # to value codes (-1 if unknown), numeric attributes keep their value (NaN if missing)
+    def encode(self, examples):
+        if not isinstance(examples, pd.DataFrame):
+            examples = np.asarray(examples, dtype=object)
+            if examples.ndim != 2 or examples.shape[1] != len(self.attributes):
+                raise ValueError(f"Expected a 2D array with {len(self.attributes)} columns ordered as "
+                                 f"{self.attributes}, got shape {examples.shape}")
+            examples = pd.DataFrame(examples, columns=self.attributes)
+        codes = np.empty((len(examples), len(self.attributes)), dtype=float)
+        for j, attribute in enumerate(self.attributes):
+            if self.numeric[j]:
+                codes[:, j] = pd.to_numeric(examples[attribute], errors='coerce')
+            else:
+                codes[:, j] = pd.Index(self.vocabularies[j]).get_indexer(examples[attribute])
+        return codes
+
+    # Classifying value codes by moving every example down one level of the tree at a time
+    def predict_codes(self, codes, unseen='plurality'):
+        node = np.zeros(len(codes), dtype=np.int64)
+        active = np.flatnonzero(self.feature[node] >= 0)
+        while len(active):
+            current = node[active]
+            feature = self.feature[current]
+            value = codes[active, feature]
+            threshold = self.threshold[current]
+            numeric = ~np.isnan(threshold)
+            known = np.where(numeric, ~np.isnan(value), value >= 0)
+            position = np.where(numeric, value > threshold, np.where(known, value, 0)).astype(np.int64)
+            child = np.where(known, self.children[self.child_start[current] + position], -1)
+
+            # Values without a branch in the node stop at the node, which then provides the label
+            missing = child < 0
+            if unseen == 'error' and missing.any():
+                attribute = self.attributes[feature[np.argmax(missing)]]
+                raise ValueError(f"Value of attribute {attribute} not seen in training")
+
+            active, child = active[~missing], child[~missing]
+            node[active] = child
+            active = active[self.feature[child] >= 0]
+        return self.label[node]
+
+    # Classifying a batch of examples (unseen is 'plurality' or 'error')
+    def predict(self, examples, unseen='plurality'):
+        if unseen not in ('plurality', 'error'):
+            raise ValueError(f"Unknown unseen value handling: {unseen}")
+        return self.classes[self.predict_codes(self.encode(examples), unseen)]
+
+    # Saving the compiled tree to a .npz file
+    def save(self, path):
+        values = {}
+        for j, vocabulary in enumerate(self.vocabularies):
+            values[f"vocabulary_{j}"], values[f"vocabulary_kinds_{j}"] = value_arrays(vocabulary)
+        values["classes"], values["class_kinds"] = value_arrays(self.classes)
+        np.savez(path, attributes=np.asarray(self.attributes), numeric=self.numeric, feature=self.feature,
+                 threshold=self.threshold, child_start=self.child_start, children=self.children, label=self.label,
+                 **values)
+
+    # Loading a compiled tree saved with save
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            attributes = arrays['attributes'].tolist()
+            vocabularies = [array_values(arrays[f"vocabulary_{j}"], arrays[f"vocabulary_kinds_{j}"])
+                            for j in range(len(attributes))]
+            classes = np.empty(len(arrays['classes']), dtype=object)
+            classes[:] = array_values(arrays['classes'], arrays['class_kinds'])
+            return cls(attributes, vocabularies, arrays['numeric'], classes, arrays['feature'],
+                       arrays['threshold'], arrays['child_start'], arrays['children'], arrays['label'])
+
+# Conversion from the text form of a value back to the value, for each kind of value_arrays
+VALUE_KINDS = {'str': str, 'int': int, 'float': float, 'bool': lambda text: text == 'True', 'none': lambda text: None}
+
+# Text form and kind of each value, so that mixed types and NaN (a category in training) are saved without pickling
+def value_arrays(values):
+    texts, kinds = [], []
+    for value in values:
+        if value is None:
+            kind = 'none'
+        elif isinstance(value, (bool, np.bool_)):
+            kind = 'bool'
+        elif isinstance(value, (int, np.integer)):
+            kind = 'int'
+        elif isinstance(value, (float, np.floating)):
+            kind = 'float'
+            value = repr(float(value))  # Exact, 'nan' for NaN
+        elif isinstance(value, str):
+            kind = 'str'
+        else:
+            raise ValueError(f"Cannot save value {value!r} of type {type(value).__name__}")
+        texts.append(str(value))
+        kinds.append(kind)
+    return np.asarray(texts, dtype=str), np.asarray(kinds, dtype=str)
+
+# Values saved with value_arrays
+def array_values(texts, kinds):
+    return [VALUE_KINDS[kind](text) for text, kind in zip(texts.tolist(), kinds.tolist())]
+
+# Compiling a (possibly pruned) decision tree into a CompiledTree, by default with the training encoding of the tree
+def compile_tree(tree, attributes=None, vocabularies=None, classes=None, numeric=None):
+    if tree.encoding is not None and (attributes is None or list(attributes) == tree.encoding[0]):
+        attributes = tree.encoding[0]
+        vocabularies = tree.encoding[1] if vocabularies is None else vocabularies
+        numeric = tree.encoding[2] if numeric is None else numeric
+
+    nodes = []
+    stack = [tree]
+    while stack:    # Pre-order, so children always come after their parent
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(list(node.branches.values())))
+    internal = [node for node in nodes if node.label is None]
+
+    if attributes is None:
+        attributes = list(dict.fromkeys(node.attribute for node in internal))
+    if numeric is None:
+        numeric = [any(node.threshold is not None for node in internal if node.attribute == attribute)
+                   for attribute in attributes]
+    if vocabularies is None:
+        vocabularies = [[] if numeric[j] else
+                        list(dict.fromkeys(value for node in internal if node.attribute == attribute
+                                           for value in node.branches)) for j, attribute in enumerate(attributes)]
+    if classes is None and tree.classes is not None:
+        classes = list(tree.classes)
+    elif classes is None:
+        classes = sorted(set(node.label for node in nodes if node.label is not None))
+    feature_index = {attribute: j for j, attribute in enumerate(attributes)}
+    value_codes = [{value: code for code, value in enumerate(v)} for v in vocabularies]
+    class_index = {label: k for k, label in enumerate(classes)}
+    node_index = {id(node): i for i, node in enumerate(nodes)}
+
+    feature = np.full(len(nodes), -1, dtype=np.int64)
+    threshold = np.full(len(nodes), np.nan)
+    child_start = np.zeros(len(nodes), dtype=np.int64)
+    children = []
+    for i, node in enumerate(nodes):
+        if node.label is not None:
             continue
-        observed.append([sum(subset['WillWait'] == label) for label in class_labels])
-    
+        feature[i] = feature_index[node.attribute]
+        child_start[i] = len(children)
+        if node.threshold is not None:
+            # Children of the numeric nodes are ordered as '<=' and '>'
+            threshold[i] = node.threshold
+            children.extend([-1, -1])
+            for position, value in enumerate(['<=', '>']):
+                if value in node.branches:
+                    children[child_start[i] + position] = node_index[id(node.branches[value])]
+            continue
+        children.extend([-1] * len(vocabularies[feature[i]]))
+        for value, subtree in node.branches.items():
+            children[child_start[i] + value_codes[feature[i]][value]] = node_index[id(subtree)]
+
+    # Plurality class of the training examples of every node, or of the leaves below the nodes without class counts
+    leaf_counts = np.zeros((len(nodes), len(classes)), dtype=np.int64)
+    for i in reversed(range(len(nodes))):   # Children first
+        node = nodes[i]
+        if node.label is not None:
+            leaf_counts[i, class_index[node.label]] = 1
+        else:
+            for subtree in node.branches.values():
+                leaf_counts[i] += leaf_counts[node_index[id(subtree)]]
+    label = leaf_counts.argmax(axis=1)
+    for i, node in enumerate(nodes):
+        if node.label is None and node.counts is not None and node.counts.any():
+            label[i] = class_index[node.classes[np.argmax(node.counts)]]
+
+    return CompiledTree(attributes, vocabularies, numeric, classes, feature, threshold, child_start,
+                        np.asarray(children, dtype=np.int64), label)
+
+# Classifying a batch of examples with a decision tree
+def predict(tree, examples, unseen='plurality'):
+    return compile_tree(tree).predict(examples, unseen)
+
+# Selecting the rows (index array) of the examples that follow a branch of a node
+def branch_rows(node, columns, rows, value):
+    column = columns[node.attribute][rows]
+    if node.threshold is None:
+        return rows[column == value]
+    elif value == '<=':
+        return rows[column <= node.threshold]
+    else:
+        return rows[column > node.threshold]
+
+# Recording on every node the class counts of the given examples (e.g. for a tree built without them)
+def record_counts(node, examples, classes=None, target='WillWait', columns=None, rows=None):
+    if classes is None:
+        classes = node.classes if node.classes is not None else np.unique(examples[target])
+    if columns is None:
+        columns = {attribute: examples[attribute].to_numpy() for attribute in examples.columns}
+        columns[target] = pd.Index(classes).get_indexer(examples[target])
+        if (columns[target] < 0).any():
+            raise ValueError(f"Examples with a {target} value that is not a class of the tree")
+        rows = np.arange(len(examples))
+
+    node.counts = np.bincount(columns[target][rows], minlength=len(classes))
+    node.classes = np.asarray(classes)
+    for value, subtree in node.branches.items():
+        record_counts(subtree, examples, classes, target, columns, branch_rows(node, columns, rows, value))
+
+# Copying the structure of a decision tree (sharing the class counts), so that it can be pruned again
+def copy_tree(node):
+    branches = {value: copy_tree(subtree) for value, subtree in node.branches.items()}
+    return DecisionTree(node.attribute, branches, node.label, node.threshold, node.counts, node.classes,
+                        node.encoding)
+
+# Determining whether to prune a node using chi-square test on the class counts of its branches
+def chi_square_test(node, alpha=0.05):
+    # A node reached by none of the examples has nothing to test and is pruned
+    if node.counts.sum() == 0:
+        return True
+
+    observed = np.array([subtree.counts for subtree in node.branches.values()])
+
+    # Skipping branches with no examples and classes absent from the node
+    observed = observed[observed.sum(axis=1) > 0]
+    observed = observed[:, observed.sum(axis=0) > 0]
+
     _, p, _, _ = chi2_contingency(observed)
 
     return p > alpha
 
-# Pruning the decision tree
-def prune_tree(node, examples):
+# Upper confidence bound of the error rate of a leaf (binomial, as in the C4.5 pessimistic estimate)
+def error_upper_bound(errors, total, alpha):
+    if errors == total:
+        return 1.0
+    return beta.ppf(1 - alpha, errors + 1, total - errors)
+
+# Determining whether to prune a node by comparing its pessimistic error as a leaf with that of its leaves
+def pessimistic_error_test(node, alpha=0.25):
+    leaves = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.label is not None:
+            leaves.append(current.counts)
+        else:
+            stack.extend(current.branches.values())
+
+    subtree_error = 0
+    for counts in leaves:
+        if counts.sum() > 0:
+            subtree_error += counts.sum() * error_upper_bound(counts.sum() - counts.max(), counts.sum(), alpha)
+    leaf_error = node.counts.sum() * error_upper_bound(node.counts.sum() - node.counts.max(), node.counts.sum(), alpha)
+
+    return leaf_error <= subtree_error
+
+# Pruning the decision tree bottom-up with the class counts recorded on its nodes during training,
+# which are first replaced by the counts of the examples when those are given (alpha None uses the
+# default significance level of the criterion)
+def prune_tree(node, examples=None, alpha=None, criterion=chi_square_test, target='WillWait'):
+    if examples is not None:
+        record_counts(node, examples, target=target)
     if node.label is not None: # Leaf node
         return
     
-    for value, subtree in list(node.branches.items()):
-        subset = examples[examples[node.attribute] == value]
-        prune_tree(subtree, subset)
+    for subtree in node.branches.values():
+        prune_tree(subtree, alpha=alpha, criterion=criterion)
     
     # Checking statistical significance
-    if chi_square_test(node, examples):
+    if criterion(node) if alpha is None else criterion(node, alpha):
         # Replace the subtree with a leaf node
-        node.label = plurality_value(examples)
+        node.label = plurality_label(node.counts, node.classes)
         node.attribute = None
         node.branches = {}
+        node.threshold = None
 
 def main():
     # Defining feature names that are not present in the dataset
@@ -144,9 +555,14 @@ def main():
     print_tree(decision_tree)
 
     # Pruning the decision tree
-    prune_tree(decision_tree, data)
+    prune_tree(decision_tree)
     print("\nPruned Decision Tree:")
     print_tree(decision_tree)
 
+    # Classifying the training examples with the compiled pruned tree
+    compiled_tree = compile_tree(decision_tree, attributes)
+    predictions = compiled_tree.predict(data)
+    print(f"\nTraining accuracy: {np.mean(predictions == data['WillWait'].to_numpy()):.2f}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,134 @@
+import os
+import copy
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from assignment10 import EncodedExamples, learn_encoded_tree, compile_tree, training_encoding
+
+# Encoded training examples of the current worker process
+worker_data = None
+
+# Majority vote over compiled decision trees sharing the same encoding
+class RandomForest:
+    def __init__(self, trees, oob_error=None):
+        self.trees = trees                  # CompiledTree of each bootstrapped tree
+        self.oob_error = oob_error          # Out-of-bag error estimated during training
+
+    # Classifying a batch of examples (unseen is 'plurality' or 'error')
+    def predict(self, examples, unseen='plurality'):
+        if unseen not in ('plurality', 'error'):
+            raise ValueError(f"Unknown unseen value handling: {unseen}")
+        # All the trees are compiled with the training encoding, so the examples are encoded only once
+        codes = self.trees[0].encode(examples)
+        classes = self.trees[0].classes
+        votes = np.zeros((len(codes), len(classes)), dtype=np.int64)
+        rows = np.arange(len(codes))
+        for tree in self.trees:
+            votes[rows, tree.predict_codes(codes, unseen)] += 1
+        return classes[votes.argmax(axis=1)]
+
+# Attribute values of the given rows in the encoding of the compiled trees (bin upper bounds for binned attributes)
+def encoded_features(data, rows):
+    features = data.codes[rows].astype(float)
+    for j in np.flatnonzero(data.numeric):
+        if j in data.numbers:
+            features[:, j] = data.numbers[j][rows]
+        else:
+            features[:, j] = data.values[j][data.codes[rows, j]]
+    return features
+
+# Saving the encoded arrays as .npy files, the workers map them in memory instead of receiving copies
+def save_encoded_examples(data, directory):
+    np.save(os.path.join(directory, "codes.npy"), data.codes)
+    np.save(os.path.join(directory, "labels.npy"), data.labels)
+    for j in data.numbers:
+        np.save(os.path.join(directory, f"numbers_{j}.npy"), data.numbers[j])
+        np.save(os.path.join(directory, f"sorted_rows_{j}.npy"), data.sorted_rows[j])
+
+    # Only the small per-attribute information is sent to the workers
+    template = copy.copy(data)
+    template.codes = template.labels = template.partition = None
+    template.numbers = dict.fromkeys(data.numbers)
+    template.sorted_rows = dict.fromkeys(data.sorted_rows)
+    return template
+
+# Mapping the encoded arrays saved by save_encoded_examples in a worker process
+def init_worker(template, directory):
+    global worker_data
+    worker_data = copy.copy(template)
+    worker_data.codes = np.load(os.path.join(directory, "codes.npy"), mmap_mode='r')
+    worker_data.labels = np.load(os.path.join(directory, "labels.npy"), mmap_mode='r')
+    worker_data.numbers = {j: np.load(os.path.join(directory, f"numbers_{j}.npy"), mmap_mode='r')
+                           for j in template.numbers}
+    worker_data.sorted_rows = {j: np.load(os.path.join(directory, f"sorted_rows_{j}.npy"), mmap_mode='r')
+                               for j in template.sorted_rows}
+    worker_data.partition = np.zeros(len(worker_data.codes), dtype=np.int32)
+
+# Training one tree on a bootstrap sample, returning it compiled with its out-of-bag predictions
+def train_tree(seed, max_features):
+    data = worker_data
+    rng = np.random.default_rng(seed)
+    n = len(data.labels)
+    rows = np.sort(rng.integers(0, n, n))
+    multiplicity = np.bincount(rows, minlength=n)
+
+    # Rows of the sample sorted by each numeric attribute, obtained from the rows sorted once before training
+    sorted_rows = {j: np.repeat(order, multiplicity[order]) for j, order in data.sorted_rows.items()}
+
+    tree = learn_encoded_tree(data, rows, list(range(len(data.attributes))), sorted_rows=sorted_rows,
+                              max_features=max_features, rng=rng)
+    attributes, vocabularies, numeric = training_encoding(data)
+    compiled_tree = compile_tree(tree, attributes, vocabularies, data.classes, numeric)
+
+    oob_rows = np.flatnonzero(multiplicity == 0)
+    oob_predictions = compiled_tree.predict_codes(encoded_features(data, oob_rows))
+    return compiled_tree, oob_rows, oob_predictions
+
+# Random forest learning algorithm (bootstrapped decision trees trained in parallel)
+def learn_random_forest(examples, attributes, n_trees=100, max_features='sqrt', target='WillWait',
+                        numeric=None, max_bins=None, n_jobs=None, seed=None):
+    data = EncodedExamples(examples, attributes, target, numeric, max_bins)
+    if max_features == 'sqrt':
+        max_features = max(1, int(np.sqrt(len(data.attributes))))
+    seeds = np.random.SeedSequence(seed).spawn(n_trees)
+
+    trees = []
+    votes = np.zeros((len(data.labels), len(data.classes)), dtype=np.int64)
+    with tempfile.TemporaryDirectory() as directory:
+        template = save_encoded_examples(data, directory)
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker,
+                                 initargs=(template, directory)) as executor:
+            for compiled_tree, oob_rows, oob_predictions in executor.map(train_tree, seeds,
+                                                                         [max_features] * n_trees):
+                trees.append(compiled_tree)
+                votes[oob_rows, oob_predictions] += 1
+
+    # Out-of-bag error over the examples left out of at least one bootstrap sample
+    voted = votes.sum(axis=1) > 0
+    oob_error = np.mean(votes[voted].argmax(axis=1) != data.labels[voted]) if voted.any() else None
+    return RandomForest(trees, oob_error)
+
+def main():
+    # Defining feature names that are not present in the dataset
+    column_names = ["Alt", "Bar", "Fri", "Hun", "Pat", "Price", "Rain", "Res", "Type", "Estimate", "WillWait"]
+
+    # Data retrieval
+    data = pd.read_csv("https://raw.githubusercontent.com/aimacode/aima-data/refs/heads/master/restaurant.csv", header=None, names=column_names)
+    attributes = list(data.columns)
+    attributes.remove('WillWait')
+
+    # Stripping whitespaces from the data to avoid issues
+    for col in data.columns:
+        if data[col].dtype == 'object':
+            data[col] = data[col].str.strip()
+
+    # Training the random forest
+    forest = learn_random_forest(data, attributes, n_trees=100, seed=0)
+    print(f"Out-of-bag error: {forest.oob_error:.2f}")
+
+    predictions = forest.predict(data)
+    print(f"Training accuracy: {np.mean(predictions == data['WillWait'].to_numpy()):.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import os
+import pickle
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from assignment10 import (DecisionTree, plurality_label, quantile_edges, table_offsets, table_gains, training_encoding,
+                          print_tree)
+
+# Version of the cache layout, part of the cache key
+CACHE_VERSION = 2
+
+# Encoding of a CSV file stored chunk by chunk on disk
+class StreamedExamples:
+    def __init__(self, directory, attributes, numeric, values, classes, n_chunks):
+        self.directory = directory                  # Directory holding the encoded chunks
+        self.attributes = attributes                # Attribute associated to each column of codes
+        self.numeric = numeric                      # Attributes split with a threshold (coded as quantile bins)
+        self.values = values                        # Sorted distinct values (bin upper bounds) of each attribute
+        self.classes = classes                      # Class label of each class index
+        self.n_chunks = n_chunks                    # Number of encoded chunks
+
+        # Position of the first value of each attribute in the stacked contingency tables
+        self.offsets = np.concatenate(([0], np.cumsum([len(v) for v in values]))).astype(np.int64)
+
+    # Path of an array of an encoded chunk
+    def path(self, name, i):
+        return os.path.join(self.directory, f"{name}_{i}.npy")
+
+# Stripping whitespaces from the text columns of a chunk, as done in main() of assignment10.py
+def clean_chunk(chunk):
+    for col in chunk.columns:
+        if pd.api.types.is_object_dtype(chunk[col]) or pd.api.types.is_string_dtype(chunk[col]):
+            chunk[col] = chunk[col].str.strip()
+    return chunk
+
+# Sorting the codes of values collected in order of appearance like pd.factorize(sort=True) in the in-memory
+# encoding (missing values last), returns the sorted values and the code mapping
+def sort_codes(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    remap, sorted_values = pd.factorize(array, sort=True, use_na_sentinel=False)
+    return np.asarray(sorted_values, dtype=object), remap.astype(np.int32)
+
+# Encoding the CSV file chunk by chunk into .npy files (one pass over the text, then one over the binary files)
+def encode_csv(path, attributes, target, chunksize, numeric, max_bins, directory, sample_size, seed, read_csv_kwargs):
+    rng = np.random.default_rng(seed)
+    vocabularies = [{} for _ in attributes]     # Code of each value, in order of appearance
+    class_codes = {}
+    sample_keys = np.empty(0)                   # Random keys of the rows kept to estimate the bin edges
+    sample = None
+
+    n_chunks = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs):
+        chunk = clean_chunk(chunk)
+        if numeric is None:
+            numeric = [a for a in attributes if pd.api.types.is_numeric_dtype(chunk[a])
+                       and not pd.api.types.is_bool_dtype(chunk[a])]
+        numeric_columns = [j for j, a in enumerate(attributes) if a in numeric]
+
+        codes = np.zeros((len(chunk), len(attributes)), dtype=np.int32)
+        for j, attribute in enumerate(attributes):
+            if j in numeric_columns:
+                continue
+            for value in pd.unique(chunk[attribute]):
+                # Missing values of every chunk share one NaN key
+                vocabularies[j].setdefault(np.nan if pd.isna(value) else value, len(vocabularies[j]))
+            codes[:, j] = pd.Index(list(vocabularies[j])).get_indexer(chunk[attribute])
+        for value in pd.unique(chunk[target]):
+            class_codes.setdefault(value, len(class_codes))
+        labels = pd.Index(list(class_codes)).get_indexer(chunk[target]).astype(np.int32)
+
+        numbers = chunk[[attributes[j] for j in numeric_columns]].to_numpy(dtype=float)
+        if np.isnan(numbers).any():
+            raise ValueError("Missing values in numeric attributes")
+
+        # Keeping the sample_size rows with the smallest random keys seen so far
+        keys = np.concatenate((sample_keys, rng.random(len(chunk))))
+        sample = numbers if sample is None else np.concatenate((sample, numbers))
+        if len(keys) > sample_size:
+            kept = np.argpartition(keys, sample_size)[:sample_size]
+            keys, sample = keys[kept], sample[kept]
+        sample_keys = keys
+
+        np.save(os.path.join(directory, f"codes_{n_chunks}.npy"), codes)
+        np.save(os.path.join(directory, f"labels_{n_chunks}.npy"), labels)
+        np.save(os.path.join(directory, f"numbers_{n_chunks}.npy"), numbers)
+        n_chunks += 1
+
+    # Values and classes get the sorted codes of the in-memory encoding, numeric attributes get quantile bins
+    numeric = np.array([a in numeric for a in attributes], dtype=bool)
+    numeric_columns = np.flatnonzero(numeric)
+    values, remaps = [], []
+    for j in range(len(attributes)):
+        if numeric[j]:
+            edges = quantile_edges(sample[:, list(numeric_columns).index(j)], max_bins)
+            values.append(np.append(edges, np.inf))
+            remaps.append(edges)
+        else:
+            sorted_values, remap = sort_codes(list(vocabularies[j]))
+            values.append(sorted_values)
+            remaps.append(remap)
+    classes, class_remap = sort_codes(list(class_codes))
+
+    for i in range(n_chunks):
+        codes = np.load(os.path.join(directory, f"codes_{i}.npy"))
+        numbers = np.load(os.path.join(directory, f"numbers_{i}.npy"))
+        for j in range(len(attributes)):
+            if numeric[j]:
+                codes[:, j] = np.searchsorted(remaps[j], numbers[:, list(numeric_columns).index(j)], side='left')
+            else:
+                codes[:, j] = remaps[j][codes[:, j]]
+        np.save(os.path.join(directory, f"codes_{i}.npy"), codes)
+        np.save(os.path.join(directory, f"labels_{i}.npy"), class_remap[np.load(os.path.join(directory, f"labels_{i}.npy"))])
+        os.remove(os.path.join(directory, f"numbers_{i}.npy"))
+
+    data = StreamedExamples(directory, list(attributes), numeric, values, classes, n_chunks)
+    with open(os.path.join(directory, "encoding.pkl"), "wb") as f:
+        pickle.dump(data, f)
+    return data
+
+# Loading the encoding of a CSV file from the cache, or creating it
+def cached_encoding(path, attributes, target, chunksize, numeric, max_bins, cache_dir, sample_size, seed, read_csv_kwargs):
+    # The cache key changes with the file and with every setting of the encoding
+    stat = (os.path.getsize(path), os.path.getmtime(path)) if os.path.exists(path) else None
+    settings = (CACHE_VERSION, os.path.abspath(path) if stat else path, stat, list(attributes), target, chunksize,
+                numeric, max_bins, sample_size, seed, sorted(read_csv_kwargs.items()))
+    key = hashlib.sha1(repr(settings).encode()).hexdigest()
+    directory = os.path.join(cache_dir, key)
+
+    if os.path.exists(os.path.join(directory, "encoding.pkl")):
+        with open(os.path.join(directory, "encoding.pkl"), "rb") as f:
+            data = pickle.load(f)
+        data.directory = directory
+        return data
+    os.makedirs(directory, exist_ok=True)
+    return encode_csv(path, attributes, target, chunksize, numeric, max_bins, directory, sample_size, seed,
+                      read_csv_kwargs)
+
+# Routing the rows of a chunk from their frontier node to the frontier node of the next level (-1 once at a leaf)
+def route(slots, codes, split_attribute, child_start, child_slots):
+    next_slots = np.full(len(slots), -1, dtype=np.int32)
+    rows = np.flatnonzero(slots >= 0)
+    attribute = split_attribute[slots[rows]]
+    rows, attribute = rows[attribute >= 0], attribute[attribute >= 0]
+    next_slots[rows] = child_slots[child_start[slots[rows]] + codes[rows, attribute]]
+    return next_slots
+
+# Creating a node from its class counts, as a leaf when it cannot be split
+def new_node(counts, columns, classes):
+    node = DecisionTree(counts=counts, classes=classes)
+    if np.count_nonzero(counts) == 1:
+        node.label = classes[np.argmax(counts)]
+    elif not columns:
+        node.label = plurality_label(counts, classes)
+    return node
+
+# Decision tree learning algorithm reading a CSV file in chunks, building the tree one level per pass over the data
+def learn_decision_tree_from_csv(path, attributes, target='WillWait', chunksize=100000, numeric=None, max_bins=255,
+                                 cache_dir=None, sample_size=100000, seed=0, **read_csv_kwargs):
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        data = cached_encoding(path, attributes, target, chunksize, numeric, max_bins,
+                               cache_dir if cache_dir is not None else temporary_directory,
+                               sample_size, seed, read_csv_kwargs)
+        n_classes = len(data.classes)
+
+        # Frontier node of each row, stored next to the chunks so that memory does not depend on the number of rows
+        nodes_directory = tempfile.mkdtemp(dir=temporary_directory)
+        for i in range(data.n_chunks):
+            n_rows = len(np.load(data.path("labels", i), mmap_mode='r'))
+            np.save(os.path.join(nodes_directory, f"nodes_{i}.npy"), np.zeros(n_rows, dtype=np.int32))
+
+        root = DecisionTree(encoding=training_encoding(data))
+        frontier = [(root, list(range(len(data.attributes))))]
+        routing = None
+        while frontier:
+            # Stacked tables of every frontier node, only over the attributes still available to the node
+            node_offsets = [table_offsets(data.offsets, columns) for _, columns in frontier]
+            node_start = np.concatenate(([0], np.cumsum([offsets[-1] for offsets in node_offsets])))
+            column_base = np.full((len(frontier), len(data.attributes)), -1, dtype=np.int64)
+            for f, (_, columns) in enumerate(frontier):
+                column_base[f, columns] = node_start[f] + node_offsets[f][:-1]
+
+            # One pass: moving the rows to the current level and counting classes per node, attribute and value
+            tables = np.zeros(node_start[-1] * n_classes, dtype=np.int64)
+            for i in range(data.n_chunks):
+                codes = np.load(data.path("codes", i))
+                labels = np.load(data.path("labels", i))
+                slots = np.load(os.path.join(nodes_directory, f"nodes_{i}.npy"), mmap_mode='r+')
+                if routing is not None:
+                    slots[:] = route(np.asarray(slots), codes, *routing)
+                    slots.flush()
+                active = np.flatnonzero(slots >= 0)
+                bases = column_base[slots[active]]
+                available = bases >= 0
+                combined = (bases + codes[active])[available] * n_classes + np.broadcast_to(
+                    labels[active, None], bases.shape)[available]
+                tables += np.bincount(combined, minlength=len(tables))
+                del slots
+            tables = tables.reshape(-1, n_classes)
+
+            # Choosing the split of every frontier node, the children that cannot be split become leaves
+            next_frontier = []
+            split_attribute = np.full(len(frontier), -1, dtype=np.int64)
+            child_start = np.zeros(len(frontier), dtype=np.int64)
+            child_slots = []
+            for f, (node, columns) in enumerate(frontier):
+                table, offsets = tables[node_start[f]:node_start[f + 1]], node_offsets[f]
+                counts = table[offsets[0]:offsets[1]].sum(axis=0)
+                if node is root:
+                    node.counts, node.classes = counts, data.classes
+                    leaf = new_node(counts, columns, data.classes)
+                    if leaf.label is not None:
+                        node.label = leaf.label
+                        continue
+
+                gains, splits = table_gains(table, counts, offsets, columns, data.numeric)
+                if np.isneginf(gains).all():
+                    node.label = plurality_label(counts, data.classes)
+                    continue
+
+                # Gains equal up to rounding are ties, broken by attribute order
+                position = int(np.flatnonzero(gains >= gains.max() - 1e-12)[0])
+                best = columns[position]
+                node.attribute = data.attributes[best]
+                width = data.offsets[best + 1] - data.offsets[best]
+                if data.numeric[best]:
+                    node.threshold = data.values[best][splits[position]]
+                    groups = [('<=', np.arange(splits[position] + 1)), ('>', np.arange(splits[position] + 1, width))]
+                    child_columns = columns
+                else:
+                    value_counts = table[offsets[position]:offsets[position + 1]].sum(axis=1)
+                    groups = [(data.values[best][code], [code]) for code in np.flatnonzero(value_counts)]
+                    child_columns = [c for c in columns if c != best]
+
+                split_attribute[f] = best
+                child_start[f] = len(child_slots)
+                block = np.full(width, -1, dtype=np.int32)
+                for key, group in groups:
+                    child = new_node(table[offsets[position] + group].sum(axis=0), child_columns, data.classes)
+                    node.branches[key] = child
+                    if child.label is None:
+                        block[group] = len(next_frontier)
+                        next_frontier.append((child, child_columns))
+                child_slots.extend(block)
+
+            frontier = next_frontier
+            routing = (split_attribute, child_start, np.asarray(child_slots, dtype=np.int32))
+    return root
+
+def main():
+    # Defining feature names that are not present in the dataset
+    column_names = ["Alt", "Bar", "Fri", "Hun", "Pat", "Price", "Rain", "Res", "Type", "Estimate", "WillWait"]
+    attributes = column_names[:-1]
+
+    # Training the decision tree reading the dataset in chunks
+    decision_tree = learn_decision_tree_from_csv("https://raw.githubusercontent.com/aimacode/aima-data/refs/heads/master/restaurant.csv",
+                                                 attributes, chunksize=4, header=None, names=column_names)
+    print("Decision Tree:")
+    print_tree(decision_tree)
+
+if __name__ == "__main__":
+    main()
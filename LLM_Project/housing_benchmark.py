@@ -0,0 +1,104 @@
+import time # For measuring latency
+import argparse # For the command line options
+import resource # For the peak memory of each benchmark process
+import multiprocessing # For running every model in its own process
+import numpy as np # For the latency percentiles
+import torch # PyTorch library for deep learning
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import r2_score
+from housing_dataset import load_housing, split_housing
+
+# Models of 'train_other_ML_models' in the notebook
+OTHER_ML_MODELS = {
+    'LinearRegression': LinearRegression,
+    'DecisionTreeRegressor': DecisionTreeRegressor,
+    'RandomForestRegressor': RandomForestRegressor,
+    'GradientBoostingRegressor': GradientBoostingRegressor,
+}
+
+
+def time_micro_batches(predict, features, micro_batch_size: int, repeats: int) -> dict:
+    """Calls 'predict' on consecutive micro-batches of the features and collects latency and throughput."""
+    latencies = []
+    predictions = None
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predictions = []
+        for batch_start in range(0, len(features), micro_batch_size):
+            batch_time = time.perf_counter()
+            predictions.append(predict(features[batch_start:batch_start + micro_batch_size]))
+            latencies.append(time.perf_counter() - batch_time)
+    total_time = time.perf_counter() - start
+    return {'p50_ms': 1000 * np.percentile(latencies, 50),
+            'p99_ms': 1000 * np.percentile(latencies, 99),
+            'rows_per_sec': repeats * len(features) / total_time,
+            'predictions': np.concatenate(predictions)}
+
+
+def benchmark_model(name: str, options: dict) -> dict:
+    """Trains (or loads) one model and measures its inference on the test partition, in a fresh process."""
+    torch.set_num_threads(options['threads'])
+    if name.startswith('T5'):
+        # Imported before the baseline so that, as for sklearn, the library is not counted as model memory
+        from transformers import T5Tokenizer
+        from housing_inference import load_model, HousingPricePredictor
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Kilobytes on Linux
+    train_data, _, test_data = split_housing(load_housing(options['data_path']))
+    actual_values = test_data['MEDV'].to_numpy()
+
+    if name.startswith('T5'):
+        model = load_model(options['checkpoint_path'], options['model_name'], quantize=name.endswith('int8'),
+                           num_threads=options['threads'])
+        predictor = HousingPricePredictor(model, T5Tokenizer.from_pretrained(options['model_name']),
+                                          micro_batch_size=options['micro_batch_size'])
+        features = test_data.drop(columns=['MEDV'])
+        predictor.predict(features[:options['micro_batch_size']])  # Warm-up
+        result = time_micro_batches(predictor.predict, features, options['micro_batch_size'], options['repeats'])
+    else:
+        # Same preprocessing as the notebook, with the scaler fitted on the train partition
+        scaler = StandardScaler()
+        model = OTHER_ML_MODELS[name]()
+        model.fit(scaler.fit_transform(train_data.drop(columns=['MEDV'])), train_data['MEDV'])
+        features = scaler.transform(test_data.drop(columns=['MEDV']))
+        result = time_micro_batches(model.predict, features, options['micro_batch_size'], options['repeats'])
+
+    predictions = result.pop('predictions')
+    valid = ~np.isnan(predictions)
+    result['r2'] = r2_score(actual_values[valid], predictions[valid]) if valid.any() else float('-inf')
+    result['invalid'] = int((~valid).sum())
+    # Peak memory added by the model (weights, inference buffers) on top of the libraries
+    result['peak_mb'] = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_kb) / 1024
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU inference benchmark of the housing T5 model and the sklearn models")
+    parser.add_argument('--checkpoint-path', default='./trained_model.pth')
+    parser.add_argument('--model-name', default='t5-small')
+    parser.add_argument('--data-path', default='./housing.csv')
+    parser.add_argument('--micro-batch-size', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--skip-t5', action='store_true', help="Only benchmark the sklearn models")
+    options = vars(parser.parse_args())
+
+    names = list(OTHER_ML_MODELS)
+    if not options['skip_t5']:
+        names = ['T5', 'T5-int8'] + names
+
+    # Every model runs in its own process so that the peak memory is not shared between models
+    context = multiprocessing.get_context('spawn')
+    print(f"{'Model':<26}{'p50 ms':>10}{'p99 ms':>10}{'rows/sec':>12}{'peak MB':>10}{'R2':>10}{'invalid':>9}")
+    for name in names:
+        with context.Pool(1) as pool:
+            result = pool.apply(benchmark_model, (name, options))
+        print(f"{name:<26}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['rows_per_sec']:>12.1f}"
+              f"{result['peak_mb']:>10.1f}{result['r2']:>10.3f}{result['invalid']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os # For interacting with the operating system
+import hashlib # For the cache keys
+import numpy as np # For the memory-mapped token arrays
+import pandas as pd # For data storage, manipulation, and fast analysis
+import torch # PyTorch library for deep learning
+from torch.utils.data import Dataset, DataLoader, Sampler # For making custom datasets and batches
+from sklearn.model_selection import train_test_split # For the train/val/test split of the notebook
+
+COLUMN_NAMES = ['CRIM', 'ZN', 'INDUS', 'CHAS', 'NOX', 'RM', 'AGE', 'DIS', 'RAD', 'TAX', 'PTRATIO', 'B', 'LSTAT', 'MEDV']
+
+# Version of the input/output string format and of the cache layout, part of the cache key
+FORMAT_VERSION = 1
+
+
+def load_housing(path: str = './housing.csv') -> pd.DataFrame:
+    """Loads the housing dataset as in the notebook."""
+    return pd.read_csv(path, header=None, delimiter=r"\s+", names=COLUMN_NAMES)
+
+
+def split_housing(data: pd.DataFrame) -> tuple:
+    """Splits the dataset into the train, val and test partitions of the notebook."""
+    train_data, val_test_data = train_test_split(data, test_size=0.2, random_state=42)
+    val_data, test_data = train_test_split(val_test_data, test_size=0.5, random_state=42)
+    return train_data, val_data, test_data
+
+
+def input_strings(features: pd.DataFrame) -> pd.Series:
+    """Builds the model input string of every row of the feature columns."""
+    # Rows of 'iterrows' are upcast to float, so every value is formatted as a float
+    values = features.astype('float64').astype(str)
+    strings = values[features.columns[0]]
+    for col in features.columns[1:]:
+        strings = strings + ', ' + values[col]
+    return strings
+
+
+def reformat_dataset(data: pd.DataFrame) -> pd.DataFrame:
+    """Builds the (input string, output string) pairs of the notebook one column at a time instead of row by row."""
+    return pd.DataFrame({0: input_strings(data[data.columns[:-1]]).to_numpy(),
+                         1: data[data.columns[-1]].astype('float64').astype(str).to_numpy()})
+
+
+def cache_key(formatted_data: pd.DataFrame, tokenizer, tokenizer_name: str) -> str:
+    """Identifies the tokenized form of the strings for the given tokenizer and format version."""
+    digest = hashlib.sha1(f"{FORMAT_VERSION}|{tokenizer_name}|{type(tokenizer).__name__}|{len(tokenizer)}".encode())
+    for text, label in zip(formatted_data[0], formatted_data[1]):
+        digest.update(f"{text}\t{label}\n".encode())
+    return digest.hexdigest()
+
+
+def save_token_ids(path: str, sequences: list) -> None:
+    """Stores variable-length token ID sequences as one flat array and the offsets of each sequence."""
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(ids) for ids in sequences])
+    flat = np.fromiter((token for ids in sequences for token in ids), dtype=np.int32, count=offsets[-1])
+    np.save(path + '_ids.npy', flat)
+    np.save(path + '_offsets.npy', offsets)
+
+
+class TokenizedDataset(Dataset):
+    """Token IDs of the inputs and labels, tokenized once and read from a memory-mapped cache."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.open()
+
+    def open(self):
+        self.input_ids = np.load(os.path.join(self.directory, 'input_ids.npy'), mmap_mode='r')
+        self.input_offsets = np.load(os.path.join(self.directory, 'input_offsets.npy'))
+        self.label_ids = np.load(os.path.join(self.directory, 'label_ids.npy'), mmap_mode='r')
+        self.label_offsets = np.load(os.path.join(self.directory, 'label_offsets.npy'))
+        self.lengths = np.diff(self.input_offsets)  # Input length of each datapoint, used to group batches
+
+    @classmethod
+    def from_frame(cls, formatted_data: pd.DataFrame, tokenizer, tokenizer_name: str,
+                   cache_dir: str = './token_cache') -> 'TokenizedDataset':
+        """Tokenizes the (input string, output string) pairs of 'reformat_dataset' unless they are already cached."""
+        directory = os.path.join(cache_dir, cache_key(formatted_data, tokenizer, tokenizer_name))
+        if not os.path.exists(os.path.join(directory, 'complete')):
+            os.makedirs(directory, exist_ok=True)
+            save_token_ids(os.path.join(directory, 'input'), tokenizer(list(formatted_data[0]))['input_ids'])
+            save_token_ids(os.path.join(directory, 'label'), tokenizer(list(formatted_data[1]))['input_ids'])
+            open(os.path.join(directory, 'complete'), 'w').close()  # Marks the cache as fully written
+        return cls(directory)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, at_index: int) -> dict:
+        return {'input_ids': self.input_ids[self.input_offsets[at_index]:self.input_offsets[at_index + 1]],
+                'labels': self.label_ids[self.label_offsets[at_index]:self.label_offsets[at_index + 1]]}
+
+    # DataLoader workers (and saved dataloaders) only receive the cache directory, not the arrays
+    def __getstate__(self):
+        return {'directory': self.directory}
+
+    def __setstate__(self, state):
+        self.directory = state['directory']
+        self.open()
+
+
+class PadCollator:
+    """Pads cached token IDs to the longest sequence of the batch, as 'collate_fn' did after tokenizing."""
+
+    def __init__(self, pad_token_id: int = 0):
+        self.pad_token_id = pad_token_id
+
+    def pad(self, sequences: list) -> torch.Tensor:
+        padded = np.full((len(sequences), max(len(ids) for ids in sequences)), self.pad_token_id, dtype=np.int64)
+        for row, ids in enumerate(sequences):
+            padded[row, :len(ids)] = ids
+        return torch.from_numpy(padded)
+
+    def __call__(self, batch: list) -> dict:
+        input_ids = self.pad([datapoint['input_ids'] for datapoint in batch])
+        lengths = torch.tensor([len(datapoint['input_ids']) for datapoint in batch])
+        attention_mask = (torch.arange(input_ids.shape[1])[None, :] < lengths[:, None]).long()
+        return {'input_ids': input_ids, 'attention_mask': attention_mask,
+                'labels': self.pad([datapoint['labels'] for datapoint in batch])}
+
+
+class LengthBucketSampler(Sampler):
+    """Yields batches of indices with similar input lengths to minimize padding.
+
+    With shuffling, the indices are shuffled every epoch, split into pools of 'pool_batches' batches,
+    sorted by length inside each pool and the resulting batches are shuffled again.
+    """
+
+    def __init__(self, lengths: np.ndarray, batch_size: int, shuffle: bool = True, pool_batches: int = 50,
+                 seed: int = 0):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.pool_batches = pool_batches
+        self.seed = seed
+        self.epoch = 0
+
+    def __iter__(self):
+        if not self.shuffle:
+            order = np.argsort(self.lengths, kind='stable')
+            yield from (order[i:i + self.batch_size].tolist() for i in range(0, len(order), self.batch_size))
+            return
+
+        rng = np.random.default_rng((self.seed, self.epoch))
+        self.epoch += 1
+        order = rng.permutation(len(self.lengths))
+        pool_size = self.batch_size * self.pool_batches
+        batches = []
+        for start in range(0, len(order), pool_size):
+            pool = order[start:start + pool_size]
+            pool = pool[np.argsort(self.lengths[pool], kind='stable')]
+            batches.extend(pool[i:i + self.batch_size].tolist() for i in range(0, len(pool), self.batch_size))
+        for batch in rng.permutation(len(batches)):
+            yield batches[batch]
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+
+def make_dataloader(dataset: TokenizedDataset, batch_size: int, shuffle: bool, pad_token_id: int = 0,
+                    num_workers: int = 2, seed: int = 0) -> DataLoader:
+    """Serves length-bucketed, padded batches from the cached token IDs with background workers."""
+    return DataLoader(dataset,
+                      batch_sampler=LengthBucketSampler(dataset.lengths, batch_size, shuffle=shuffle, seed=seed),
+                      collate_fn=PadCollator(pad_token_id),
+                      num_workers=num_workers,
+                      pin_memory=torch.cuda.is_available(),
+                      persistent_workers=num_workers > 0,
+                      prefetch_factor=4 if num_workers > 0 else None)
+
+
+def build_datasets(data: pd.DataFrame, tokenizer, tokenizer_name: str, cache_dir: str = './token_cache') -> tuple:
+    """Splits, reformats and tokenizes the housing dataset once, returning the train, val and test datasets."""
+    return tuple(TokenizedDataset.from_frame(reformat_dataset(partition), tokenizer, tokenizer_name, cache_dir)
+                 for partition in split_housing(data))
@@ -0,0 +1,97 @@
+import numpy as np # For the predicted values
+import pandas as pd # For data storage, manipulation, and fast analysis
+import torch # PyTorch library for deep learning
+from transformers import T5Tokenizer, T5ForConditionalGeneration, LogitsProcessor, LogitsProcessorList # For the T5 model
+from housing_dataset import input_strings # For the model input strings
+
+CHECKPOINT_PATH = './trained_model.pth'
+
+
+def load_model(checkpoint_path: str = CHECKPOINT_PATH, model_name: str = "t5-small", quantize: bool = False,
+               num_threads: int = None) -> T5ForConditionalGeneration:
+    """Loads the fine-tuned model saved by 'train_model' for CPU inference, optionally with int8 dynamic quantization."""
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    model = T5ForConditionalGeneration.from_pretrained(model_name)
+    checkpoint = torch.load(checkpoint_path, map_location='cpu')
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    if quantize:
+        # Weights of the linear layers are stored in int8 and activations are quantized on the fly
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+class NumericLogitsProcessor(LogitsProcessor):
+    """Restricts decoding to a single number: digits with at most one decimal point, then the end token."""
+
+    def __init__(self, tokenizer: T5Tokenizer):
+        self.tokens = [(token_id, token) for token, token_id in tokenizer.get_vocab().items()]
+        self.eos_token_id = tokenizer.eos_token_id
+        self.masks = None
+
+    def build_masks(self, vocab_size: int) -> tuple:
+        """Flags the numeric tokens and, among them, those with digits, with a decimal point and starting a word."""
+        # The model vocabulary can be larger than the tokenizer's, the extra IDs are never allowed
+        numeric, digit, dot, word_start = (torch.zeros(vocab_size, dtype=torch.bool) for _ in range(4))
+        for token_id, token in self.tokens:
+            text = token.replace('▁', '')
+            if token_id < vocab_size and token != '' and all(char in '0123456789.' for char in text):
+                numeric[token_id] = True
+                digit[token_id] = any(char.isdigit() for char in text)
+                dot[token_id] = '.' in text
+                word_start[token_id] = token.startswith('▁')
+        return numeric, digit, dot, word_start
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self.masks is None or len(self.masks[0]) != scores.shape[-1]:
+            self.masks = self.build_masks(scores.shape[-1])
+        numeric, digit, dot, word_start = (mask.to(scores.device) for mask in self.masks)
+
+        # A second decimal point or a new word would start another number, the end token needs a digit first
+        seen_digit = digit[input_ids].any(dim=1, keepdim=True)
+        seen_dot = dot[input_ids].any(dim=1, keepdim=True)
+        allowed = numeric[None, :] & ~(seen_dot & dot[None, :]) & ~(seen_digit & word_start[None, :])
+        allowed[:, self.eos_token_id] = seen_digit[:, 0]
+        return scores.masked_fill(~allowed, float('-inf'))
+
+
+def parse_prediction(text: str) -> float:
+    """Converts a decoded prediction to a float, NaN if the model did not write a number."""
+    try:
+        return float(text.replace(' ', ''))
+    except ValueError:
+        return float('nan')
+
+
+class HousingPricePredictor:
+    """Predicts MEDV for rows of the 13 housing features by generating in micro-batches on the CPU."""
+
+    def __init__(self, model: T5ForConditionalGeneration, tokenizer: T5Tokenizer, micro_batch_size: int = 32,
+                 max_new_tokens: int = 10, constrained: bool = True):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.micro_batch_size = micro_batch_size
+        self.max_new_tokens = max_new_tokens
+        self.logits_processor = LogitsProcessorList()
+        if constrained:
+            self.logits_processor.append(NumericLogitsProcessor(tokenizer))
+
+    def predict_strings(self, texts: list) -> np.ndarray:
+        """Predicts the values for already formatted input strings."""
+        predictions = []
+        with torch.inference_mode():
+            for start in range(0, len(texts), self.micro_batch_size):
+                batch = self.tokenizer(texts[start:start + self.micro_batch_size], padding=True, return_tensors='pt')
+                generate_outputs = self.model.generate(input_ids=batch['input_ids'],
+                                                       attention_mask=batch['attention_mask'],
+                                                       max_new_tokens=self.max_new_tokens,
+                                                       num_beams=1, do_sample=False,
+                                                       logits_processor=self.logits_processor)
+                decoded_preds = self.tokenizer.batch_decode(generate_outputs, skip_special_tokens=True)
+                predictions.extend(parse_prediction(pred) for pred in decoded_preds)
+        return np.array(predictions)
+
+    def predict(self, features: pd.DataFrame) -> np.ndarray:
+        """Predicts the values for a DataFrame of feature columns (without MEDV)."""
+        return self.predict_strings(list(input_strings(features)))